@@ -6,11 +6,16 @@ import numpy as np
 from pathlib import Path
 from datetime import datetime
 import glob
-import os
+import argparse
+
+from util_io import _iter_xls, load_xls_cached, run_parallel, run_stamp, write_results
+from util_freq import _detect_columns, _groupby_mean_int, classify_frequencies
 
 def classify_frequency(freq: float, base: int = 50) -> int:
     """Classify a frequency value to the nearest base frequency multiple.
     
+    Use ``classify_frequencies`` to classify a whole column at once.
+    
     Args:
         freq (float): The frequency value to classify.
         base (int, optional): The base frequency for classification. 
@@ -25,78 +30,71 @@ def classify_frequency(freq: float, base: int = 50) -> int:
     """
     return round(freq / base) * base
 
-def process_frequency_data(input_file: str, base: int = 50) -> pd.DataFrame:
+def process_frequency_data(input_file: str, base: int = 50, write_xlsx: bool = False, write_detailed: bool = False, exp_num: str = None, date_str: str = None) -> pd.DataFrame:
     """Process frequency data from Excel file and classify frequencies.
     
     Args:
         input_file (str): Path to the input Excel file.
         base (int, optional): Base frequency for classification. 
             Defaults to 50.
+        write_xlsx (bool, optional): Whether to also save the results as an
+            xlsx workbook. Defaults to False.
+        write_detailed (bool, optional): Whether to also save the per-row
+            detailed results next to the grouped results. Defaults to False.
+        exp_num (str, optional): Experiment name used in the output filename.
+            If None, uses the name of the current working directory.
+            Defaults to None.
+        date_str (str, optional): Date used in the output filename, as YYYYMMDD.
+            If None, uses today's date. Defaults to None.
     
     Returns:
         pd.DataFrame: DataFrame containing original and classified frequencies 
             with their magnitude values.
     """
     # Read Excel file
-    df = pd.read_excel(input_file)
-    
-    # Try to identify the frequency and magnitude columns
-    freq_column = None
-    mag_column = None
-    
-    # Define possible column name patterns
-    freq_patterns = ['Frequency', 'frequency', 'freq', 'Freq', 'Hz', 'hz']
-    mag_patterns = ['dBSPL', 'dbspl', 'mag', 'magnitude', 'DB', 'db']
-    
-    # Find frequency column
-    for col in df.columns:
-        if any(pattern in str(col).lower() for pattern in freq_patterns):
-            freq_column = col
-            break
-    
-    # Find magnitude column
-    for col in df.columns:
-        if any(pattern in str(col).lower() for pattern in mag_patterns):
-            mag_column = col
-            break
-    
-    if freq_column is None:
-        freq_column = df.columns[0]
-        print(f"Assuming first column '{freq_column}' contains frequencies")
-    
-    if mag_column is None:
-        mag_column = df.columns[1]
-        print(f"Assuming second column '{mag_column}' contains magnitude values")
-    
-    # Create result DataFrame with original and classified frequencies
-    result_df = pd.DataFrame({
-        'Original_Frequency': df[freq_column],
-        'Classified_Frequency': df[freq_column].apply(lambda x: classify_frequency(x, base)),
-        'Magnitude': df[mag_column]
-    })
+    df = load_xls_cached(Path(input_file))
+    
+    # Identify the frequency and magnitude columns
+    freq_column, mag_column = _detect_columns(df)
+    
+    # Classify all frequencies in a single vectorized pass
+    classified = classify_frequencies(df[freq_column], base).to_numpy()
+    mags = df[mag_column].to_numpy(dtype=np.float64)
+    bins = classified // base
     
     # Group by classified frequency and calculate mean magnitude
-    grouped_df = result_df.groupby('Classified_Frequency')['Magnitude'].agg([
-        ('Mean_Magnitude', 'mean'),
-        ('Count', 'count')
-    ]).reset_index()
+    unique_bins, mean_mags, counts = _groupby_mean_int(bins, mags)
+    grouped_df = pd.DataFrame({
+        'Classified_Frequency': unique_bins * base,
+        'Mean_Magnitude': mean_mags,
+        'Count': counts
+    })
     
     # Generate output filename with HL folder name
     path = Path(input_file)
     hl_folder = path.parent.name
     file_name = path.stem
-    date_str = datetime.now().strftime('%Y%m%d')
-    exp_num = Path.cwd().name
+    if date_str is None:
+        date_str = datetime.now().strftime('%Y%m%d')
+    if exp_num is None:
+        exp_num = Path.cwd().name
     output_file = f"{exp_num}_{date_str}_{hl_folder}_{file_name}_freq{base}.xlsx"
     output_path = Path("classified_frequencies") / output_file
     
     # Create output directory if it doesn't exist
     output_path.parent.mkdir(exist_ok=True)
     
-    # Save both detailed and grouped results
-    with pd.ExcelWriter(output_path) as writer:
-        result_df.to_excel(writer, sheet_name='Detailed_Results', index=False)
-        grouped_df.to_excel(writer, sheet_name='Grouped_Results', index=False)
+    # Save grouped results, and the detailed results if requested
+    sheets = {}
+    if write_detailed:
+        # Only build the per-row results when they are actually written
+        sheets['Detailed_Results'] = pd.DataFrame({
+            'Original_Frequency': df[freq_column].to_numpy(dtype=np.float64),
+            'Classified_Frequency': classified,
+            'Magnitude': mags
+        })
+    sheets['Grouped_Results'] = grouped_df
+    output_path = write_results(sheets, output_path, human=write_xlsx)
     
     print(f"Results saved to {output_path}")
     print(f"\nFound {len(grouped_df)} unique {base}Hz frequency groups")
@@ -104,28 +102,51 @@ def process_frequency_data(input_file: str, base: int = 50) -> pd.DataFrame:
     
     return grouped_df
 
-def process_folder(folder_path: str, base: int = 50) -> None:
+def _process_file_worker(file_path: str, base: int, write_xlsx: bool, write_detailed: bool, exp_num: str, date_str: str) -> None:
+    """Process a single file in a worker process, reporting any error.
+    
+    Args:
+        file_path (str): Path to the Excel file.
+        base (int): Base frequency for classification.
+        write_xlsx (bool): Whether to also save the results as an xlsx workbook.
+        write_detailed (bool): Whether to also save the detailed results.
+        exp_num (str): Experiment name used in the output filename.
+        date_str (str): Date used in the output filename.
+    """
+    try:
+        print(f"\nProcessing {file_path}...")
+        result = process_frequency_data(file_path, base, write_xlsx, write_detailed, exp_num, date_str)
+        print(f"Successfully processed {file_path}")
+        print("\nFirst few grouped frequencies:")
+        print(result.head())
+    except Exception as e:
+        print(f"Error processing {file_path}: {str(e)}")
+
+def process_folder(folder_path: str, base: int = 50, write_xlsx: bool = False, write_detailed: bool = False) -> None:
     """Process all Excel files in the specified folder.
     
     Args:
         folder_path (str): Path to the folder containing Excel files.
         base (int, optional): Base frequency for classification. 
             Defaults to 50.
+        write_xlsx (bool, optional): Whether to also save the results as
+            xlsx workbooks. Defaults to False.
+        write_detailed (bool, optional): Whether to also save the detailed
+            results. Defaults to False.
     """
-    xls_files = glob.glob(os.path.join(folder_path, "*.xls"))
-    
-    for file_path in xls_files:
-        try:
-            print(f"\nProcessing {file_path}...")
-            result = process_frequency_data(file_path, base)
-            print(f"Successfully processed {file_path}")
-            print("\nFirst few grouped frequencies:")
-            print(result.head())
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
+    exp_num, date_str = run_stamp()
+    
+    run_parallel(_process_file_worker, _iter_xls(folder_path), base, write_xlsx, write_detailed, exp_num, date_str)
 
 def main():
     """Main function to process frequency classification for all HL folders."""
+    parser = argparse.ArgumentParser(description="Classify frequencies for all HL folders.")
+    parser.add_argument('--xlsx', action='store_true',
+                        help="also save the results as xlsx workbooks")
+    parser.add_argument('--detailed', action='store_true',
+                        help="also save the per-row detailed results")
+    args = parser.parse_args()
+    
     # Get all HL folders
     hl_folders = glob.glob("HL*")
     base_freq = 50  # Base frequency for classification
@@ -137,10 +158,11 @@ def main():
     print(f"Found {len(hl_folders)} HL folders")
     print(f"Using {base_freq}Hz as base frequency for classification")
     
-    # Process each folder
-    for folder in sorted(hl_folders):
-        print(f"\nProcessing folder {folder}...")
-        process_folder(folder, base_freq)
+    exp_num, date_str = run_stamp()
+    
+    # Process the files of all folders in a single pool
+    xls_files = _iter_xls(*sorted(hl_folders))
+    run_parallel(_process_file_worker, xls_files, base_freq, args.xlsx, args.detailed, exp_num, date_str)
     
     print("\nAll processing completed!")
 
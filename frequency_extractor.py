@@ -6,9 +6,165 @@ import numpy as np
 from pathlib import Path
 from datetime import datetime
 import glob
-import os
+import argparse
+from typing import NamedTuple
 
-def extract_specific_frequencies(input_file: str, target_frequencies: list = None) -> pd.DataFrame:
+from util_io import _iter_xls, load_xls_cached, run_parallel, run_stamp, write_results
+from util_freq import _detect_columns
+
+try:
+    from numba import njit
+    _HAVE_NUMBA = True
+except ImportError:
+    # numba is optional; without it the NumPy lookup is always used
+    _HAVE_NUMBA = False
+    
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+# Source tables with more rows than this use the numba lookup when available
+_NUMBA_MIN_ROWS = 50_000
+
+# Default frequencies to extract, from 50 to 22000 Hz in steps of 50
+_DEFAULT_TARGETS = np.arange(50, 22050, 50, dtype=np.float64)
+
+class FileIndex(NamedTuple):
+    """Frequencies of a source table in sorted order, computed once per file.
+    
+    Attributes:
+        sf (np.ndarray): Sorted float64 frequencies without NaN values.
+        order (np.ndarray): Row index of each sorted frequency.
+    """
+    sf: np.ndarray
+    order: np.ndarray
+    
+    @classmethod
+    def from_frequencies(cls, freqs: np.ndarray) -> 'FileIndex':
+        """Sort the frequency values of the source data, dropping NaN values.
+        
+        Frequencies from an FFT sweep are usually already in increasing
+        order, in which case the sort is skipped.
+        
+        Args:
+            freqs (np.ndarray): Float64 frequency values of the source data.
+        
+        Returns:
+            FileIndex: Sorted frequencies and their row indices.
+        """
+        if not np.isnan(freqs).any() and np.all(freqs[1:] >= freqs[:-1]):
+            return cls(freqs, np.arange(len(freqs)))
+        
+        valid = np.flatnonzero(~np.isnan(freqs))
+        order = valid[np.argsort(freqs[valid], kind='stable')]
+        
+        return cls(freqs[order], order)
+
+def _nearest_indices(index: FileIndex, targets: np.ndarray) -> np.ndarray:
+    """Find the row index of the closest frequency for each target frequency.
+    
+    Locates both neighbours of every target in the sorted frequencies with a
+    single binary search, instead of scanning the whole column per target.
+    Ties resolve to the earliest row and NaN values are ignored, as with
+    ``idxmin``.
+    
+    Args:
+        index (FileIndex): Sorted frequencies of the source data.
+        targets (np.ndarray): Float64 frequencies to look up.
+    
+    Returns:
+        np.ndarray: Positional row index of the closest frequency per target.
+    """
+    sf, order = index
+    
+    # Neighbours on either side of each target in the sorted frequencies,
+    # moved to the first row of any run of duplicate frequencies
+    idx = np.searchsorted(sf, targets)
+    left = np.searchsorted(sf, sf[np.maximum(idx - 1, 0)])
+    right = np.minimum(idx, len(sf) - 1)
+    
+    # Pick the closer neighbour, falling back to the earlier row on ties
+    left_dist = np.abs(sf[left] - targets)
+    right_dist = np.abs(sf[right] - targets)
+    pick_left = (left_dist < right_dist) | ((left_dist == right_dist) & (order[left] <= order[right]))
+    
+    return np.where(pick_left, order[left], order[right])
+
+@njit(cache=True, fastmath=True)
+def _nearest_numba(sf: np.ndarray, order: np.ndarray, targets: np.ndarray) -> np.ndarray:
+    """Find the row index of the closest frequency for each target frequency.
+    
+    Compiled equivalent of ``_nearest_indices`` for very large source tables,
+    doing one binary search per target. Ties resolve to the earliest row.
+    
+    Args:
+        sf (np.ndarray): Sorted float64 frequencies without NaN values.
+        order (np.ndarray): Row index of each sorted frequency.
+        targets (np.ndarray): Float64 frequencies to look up.
+    
+    Returns:
+        np.ndarray: Positional row index of the closest frequency per target.
+    """
+    n = sf.shape[0]
+    closest_idx = np.empty(targets.shape[0], dtype=np.int64)
+    
+    for i in range(targets.shape[0]):
+        target = targets[i]
+        
+        # First position whose frequency is not below the target
+        lo = 0
+        hi = n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if sf[mid] < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        
+        # Neighbours on either side, moved to the first of any run of
+        # duplicate frequencies
+        right = min(lo, n - 1)
+        left = max(lo - 1, 0)
+        while left > 0 and sf[left - 1] == sf[left]:
+            left -= 1
+        
+        # Pick the closer neighbour, falling back to the earlier row on ties
+        left_dist = abs(sf[left] - target)
+        right_dist = abs(sf[right] - target)
+        if left_dist < right_dist or (left_dist == right_dist and order[left] <= order[right]):
+            closest_idx[i] = order[left]
+        else:
+            closest_idx[i] = order[right]
+    
+    return closest_idx
+
+def _extract_nearest(freqs: np.ndarray, mags: np.ndarray, targets: np.ndarray, index: FileIndex = None) -> tuple:
+    """Find the closest frequency and its magnitude for each target frequency.
+    
+    Uses the numba kernel for very large source tables when numba is
+    installed, and the NumPy lookup otherwise.
+    
+    Args:
+        freqs (np.ndarray): Float64 frequency values of the source data.
+        mags (np.ndarray): Float64 magnitude values of the source data.
+        targets (np.ndarray): Float64 frequencies to look up.
+        index (FileIndex, optional): Sorted frequencies of the source data.
+            If None, it is built from ``freqs``. Defaults to None.
+    
+    Returns:
+        tuple: Closest frequency and its magnitude per target.
+    """
+    if index is None:
+        index = FileIndex.from_frequencies(freqs)
+    
+    if _HAVE_NUMBA and len(freqs) > _NUMBA_MIN_ROWS:
+        closest_idx = _nearest_numba(index.sf, index.order, targets)
+    else:
+        closest_idx = _nearest_indices(index, targets)
+    
+    # Only the rows closest to a target are gathered
+    return freqs[closest_idx], mags[closest_idx]
+
+def extract_specific_frequencies(input_file: str, target_frequencies: list = None, write_xlsx: bool = False, exp_num: str = None, date_str: str = None) -> pd.DataFrame:
     """Extract specific frequency points from an Excel file.
     
     Args:
@@ -16,6 +172,13 @@ def extract_specific_frequencies(input_file: str, target_frequencies: list = Non
         target_frequencies (list, optional): List of frequencies to extract.
             If None, uses frequencies from 50 to 22000 Hz in steps of 50.
             Defaults to None.
+        write_xlsx (bool, optional): Whether to also save the results as an
+            xlsx workbook. Defaults to False.
+        exp_num (str, optional): Experiment name used in the output filename.
+            If None, uses the name of the current working directory.
+            Defaults to None.
+        date_str (str, optional): Date used in the output filename, as YYYYMMDD.
+            If None, uses today's date. Defaults to None.
     
     Returns:
         pd.DataFrame: DataFrame containing the extracted frequency points and their magnitude values.
@@ -25,62 +188,35 @@ def extract_specific_frequencies(input_file: str, target_frequencies: list = Non
         >>> print(df.head())
     """
     # Read Excel file
-    df = pd.read_excel(input_file)
-    
-    # Try to identify the frequency and magnitude columns
-    freq_column = None
-    mag_column = None
-    
-    # Define possible column name patterns
-    freq_patterns = ['Frequency', 'frequency', 'freq', 'Freq', 'Hz', 'hz']
-    mag_patterns = ['dBSPL', 'dbspl', 'mag', 'magnitude', 'DB', 'db']
-    
-    # Find frequency column
-    for col in df.columns:
-        if any(pattern in str(col).lower() for pattern in freq_patterns):
-            freq_column = col
-            break
-    
-    # Find magnitude column
-    for col in df.columns:
-        if any(pattern in str(col).lower() for pattern in mag_patterns):
-            mag_column = col
-            break
-    
-    if freq_column is None:
-        # If no frequency column found, assume first column is frequency
-        freq_column = df.columns[0]
-        print(f"Assuming first column '{freq_column}' contains frequencies")
-    
-    if mag_column is None:
-        # If no magnitude column found, assume second column is magnitude
-        mag_column = df.columns[1]
-        print(f"Assuming second column '{mag_column}' contains magnitude values")
-    
-    # If no specific frequencies provided, generate range from 50 to 22000 in steps of 50
-    if target_frequencies is None:
-        target_frequencies = list(range(50, 22050, 50))
+    df = load_xls_cached(Path(input_file))
+    
+    # Identify the frequency and magnitude columns
+    freq_column, mag_column = _detect_columns(df)
+    
+    # If no specific frequencies provided, use the shared range from 50 to 22000 in steps of 50
+    targets = _DEFAULT_TARGETS if target_frequencies is None else np.asarray(target_frequencies, dtype=np.float64)
     
     # Find closest frequency points in the data
-    result_rows = []
-    for target_freq in target_frequencies:
-        # Find the closest frequency in the dataset
-        closest_idx = (df[freq_column] - target_freq).abs().idxmin()
-        # Only keep frequency and magnitude columns
-        result_row = pd.Series({
-            freq_column: df.loc[closest_idx, freq_column],
-            mag_column: df.loc[closest_idx, mag_column]
-        })
-        result_rows.append(result_row)
-    
-    result_df = pd.DataFrame(result_rows)
+    closest_freqs, closest_mags = _extract_nearest(
+        df[freq_column].to_numpy(dtype=np.float64),
+        df[mag_column].to_numpy(dtype=np.float64),
+        targets
+    )
+    
+    # Only keep frequency and magnitude columns
+    result_df = pd.DataFrame({
+        freq_column: closest_freqs,
+        mag_column: closest_mags
+    })
     
     # Get HL folder name and file name
     path = Path(input_file)
     hl_folder = path.parent.name
     file_name = path.stem
-    date_str = datetime.now().strftime('%Y%m%d')
-    exp_num = Path.cwd().name
+    if date_str is None:
+        date_str = datetime.now().strftime('%Y%m%d')
+    if exp_num is None:
+        exp_num = Path.cwd().name
     
     # Generate output filename including HL folder name
     output_file = f"{exp_num}_{date_str}_{hl_folder}_{file_name}_magnitude.xlsx"
@@ -90,12 +226,29 @@ def extract_specific_frequencies(input_file: str, target_frequencies: list = Non
     output_path.parent.mkdir(exist_ok=True)
     
     # Save results
-    result_df.to_excel(output_path, index=False)
+    output_path = write_results(result_df, output_path, human=write_xlsx)
     print(f"Results saved to {output_path}")
     
     return result_df
 
-def process_folder(folder_path: str, target_frequencies: list = None) -> None:
+def _process_file_worker(file_path: str, target_frequencies: list, write_xlsx: bool, exp_num: str, date_str: str) -> None:
+    """Extract frequency points from a single file in a worker process, reporting any error.
+    
+    Args:
+        file_path (str): Path to the .xls file.
+        target_frequencies (list): List of specific frequencies to extract.
+        write_xlsx (bool): Whether to also save the results as an xlsx workbook.
+        exp_num (str): Experiment name used in the output filename.
+        date_str (str): Date used in the output filename.
+    """
+    try:
+        print(f"\nProcessing {file_path}...")
+        result = extract_specific_frequencies(file_path, target_frequencies, write_xlsx, exp_num, date_str)
+        print(f"Successfully processed {file_path}")
+    except Exception as e:
+        print(f"Error processing {file_path}: {str(e)}")
+
+def process_folder(folder_path: str, target_frequencies: list = None, write_xlsx: bool = False) -> None:
     """Process all .xls files in the specified folder.
     
     Args:
@@ -103,21 +256,19 @@ def process_folder(folder_path: str, target_frequencies: list = None) -> None:
         target_frequencies (list, optional): List of specific frequencies to extract.
             If None, will use frequencies from 50 to 22000 Hz in steps of 50.
             Defaults to None.
+        write_xlsx (bool, optional): Whether to also save the results as
+            xlsx workbooks. Defaults to False.
     """
-    xls_files = glob.glob(os.path.join(folder_path, "*.xls"))
-    
-    for file_path in xls_files:
-        try:
-            print(f"\nProcessing {file_path}...")
-            result = extract_specific_frequencies(file_path, target_frequencies)
-            print(f"Successfully processed {file_path}")
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
+    exp_num, date_str = run_stamp()
+    
+    run_parallel(_process_file_worker, _iter_xls(folder_path), target_frequencies, write_xlsx, exp_num, date_str)
 
 def main():
     """Main function to process the frequency points extraction for all HL folders."""
-    # Generate frequencies from 50 to 22000 in steps of 50
-    target_frequencies = list(range(50, 22050, 50))
+    parser = argparse.ArgumentParser(description="Extract frequency points for all HL folders.")
+    parser.add_argument('--xlsx', action='store_true',
+                        help="also save the results as xlsx workbooks")
+    args = parser.parse_args()
     
     # Get all HL folders
     hl_folders = glob.glob("HL*")
@@ -128,11 +279,12 @@ def main():
     
     print(f"Found {len(hl_folders)} HL folders")
     
-    # Process each folder
-    for folder in sorted(hl_folders):
-        print(f"\nProcessing folder {folder}...")
-        process_folder(folder, target_frequencies)
-        
+    exp_num, date_str = run_stamp()
+    
+    # Process the files of all folders in a single pool
+    xls_files = _iter_xls(*sorted(hl_folders))
+    run_parallel(_process_file_worker, xls_files, None, args.xlsx, exp_num, date_str)
+    
     print("\nAll processing completed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from datetime import datetime
+import glob
+import argparse
+
+from util_io import _iter_xls, load_xls_cached, run_parallel, run_stamp, write_results
+from util_freq import _detect_columns, _groupby_mean_int, classify_frequencies
+from frequency_extractor import _DEFAULT_TARGETS, FileIndex, _extract_nearest
+
+def run_pipeline(input_file: str, base: int = 50, targets: list = None, write_xlsx: bool = False, exp_num: str = None, date_str: str = None) -> pd.DataFrame:
+    """Extract specific frequency points from a file and classify them in one pass.
+    
+    Does the work of ``frequency_extractor`` followed by
+    ``process_extracted_frequencies`` on the same data, without writing and
+    reading back the extracted frequencies in between.
+    
+    Args:
+        input_file (str): Path to the input Excel file.
+        base (int, optional): Base frequency for classification.
+            Defaults to 50.
+        targets (list, optional): List of frequencies to extract.
+            If None, uses frequencies from 50 to 22000 Hz in steps of 50.
+            Defaults to None.
+        write_xlsx (bool, optional): Whether to also save the results as an
+            xlsx workbook. Defaults to False.
+        exp_num (str, optional): Experiment name used in the output filename.
+            If None, uses the name of the current working directory.
+            Defaults to None.
+        date_str (str, optional): Date used in the output filename, as YYYYMMDD.
+            If None, uses today's date. Defaults to None.
+    
+    Returns:
+        pd.DataFrame: DataFrame containing the classified frequencies and their
+            mean magnitude values.
+    
+    Example:
+        >>> df = run_pipeline("HL1/Pon.xls")
+        >>> print(df.head())
+    """
+    # Read Excel file
+    df = load_xls_cached(Path(input_file))
+    
+    # Identify the frequency and magnitude columns
+    freq_column, mag_column = _detect_columns(df)
+    
+    # Sort the frequencies once, skipped when they are already increasing
+    freqs = df[freq_column].to_numpy(dtype=np.float64)
+    index = FileIndex.from_frequencies(freqs)
+    
+    # Find closest frequency points in the data
+    targets = _DEFAULT_TARGETS if targets is None else np.asarray(targets, dtype=np.float64)
+    closest_freqs, closest_mags = _extract_nearest(
+        freqs,
+        df[mag_column].to_numpy(dtype=np.float64),
+        targets,
+        index
+    )
+    
+    # Classify the extracted frequencies and calculate mean magnitude per group
+    classified = classify_frequencies(pd.Series(closest_freqs), base).to_numpy()
+    bins = classified // base
+    unique_bins, mean_mags, counts = _groupby_mean_int(bins, closest_mags)
+    grouped_df = pd.DataFrame({
+        'Classified_Frequency': unique_bins * base,
+        'Mean_Magnitude': mean_mags,
+        'Count': counts
+    })
+    
+    # Generate output filename with HL folder name
+    path = Path(input_file)
+    hl_folder = path.parent.name
+    file_name = path.stem
+    if date_str is None:
+        date_str = datetime.now().strftime('%Y%m%d')
+    if exp_num is None:
+        exp_num = Path.cwd().name
+    output_file = f"{exp_num}_{date_str}_{hl_folder}_{file_name}_reclass{base}.xlsx"
+    output_path = Path("reclassified_frequencies") / output_file
+    
+    # Create output directory if it doesn't exist
+    output_path.parent.mkdir(exist_ok=True)
+    
+    # Save grouped results
+    output_path = write_results({'Grouped_Results': grouped_df}, output_path, human=write_xlsx)
+    print(f"Results saved to {output_path}")
+    
+    return grouped_df
+
+def _process_file_worker(file_path: str, base: int, write_xlsx: bool, exp_num: str, date_str: str) -> None:
+    """Run the pipeline on a single file in a worker process, reporting any error.
+    
+    Args:
+        file_path (str): Path to the .xls file.
+        base (int): Base frequency for classification.
+        write_xlsx (bool): Whether to also save the results as an xlsx workbook.
+        exp_num (str): Experiment name used in the output filename.
+        date_str (str): Date used in the output filename.
+    """
+    try:
+        run_pipeline(file_path, base, write_xlsx=write_xlsx, exp_num=exp_num, date_str=date_str)
+    except Exception as e:
+        print(f"Error processing {file_path}: {str(e)}")
+
+def main():
+    """Main function to run the extraction and reclassification for all HL folders."""
+    parser = argparse.ArgumentParser(description="Extract and reclassify frequency points for all HL folders.")
+    parser.add_argument('--xlsx', action='store_true',
+                        help="also save the results as xlsx workbooks")
+    args = parser.parse_args()
+    
+    base_freq = 50  # Base frequency for classification
+    
+    # Get all HL folders
+    hl_folders = glob.glob("HL*")
+    
+    if not hl_folders:
+        print("No HL folders found!")
+        return
+    
+    print(f"Found {len(hl_folders)} HL folders")
+    
+    exp_num, date_str = run_stamp()
+    
+    # Process the files of all folders in a single pool
+    xls_files = _iter_xls(*sorted(hl_folders))
+    run_parallel(_process_file_worker, xls_files, base_freq, args.xlsx, exp_num, date_str)
+    
+    print("\nAll processing completed!")
+
+if __name__ == "__main__":
+    main()
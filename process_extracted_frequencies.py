@@ -7,11 +7,16 @@ from pathlib import Path
 from datetime import datetime
 import glob
 import os
-from tqdm import tqdm
+import argparse
+
+from util_io import load_xls_cached, run_parallel, run_stamp, write_results
+from util_freq import _detect_columns, _groupby_mean_int, classify_frequencies
 
 def classify_frequency(freq: float, base: int = 50) -> int:
     """Classify a frequency value to the nearest base frequency multiple.
     
+    Use ``classify_frequencies`` to classify a whole column at once.
+    
     Args:
         freq (float): The frequency value to classify.
         base (int, optional): Base frequency for classification. 
@@ -26,13 +31,22 @@ def classify_frequency(freq: float, base: int = 50) -> int:
     """
     return round(freq / base) * base
 
-def process_extracted_file(input_file: str, base: int = 50) -> pd.DataFrame:
+def process_extracted_file(input_file: str, base: int = 50, write_xlsx: bool = False, write_detailed: bool = False, exp_num: str = None, date_str: str = None) -> pd.DataFrame:
     """Process extracted frequency data from Excel file and classify frequencies.
     
     Args:
-        input_file (str): Path to the input Excel file.
+        input_file (str): Path to the input Excel or parquet file.
         base (int, optional): Base frequency for classification. 
             Defaults to 50.
+        write_xlsx (bool, optional): Whether to also save the results as an
+            xlsx workbook. Defaults to False.
+        write_detailed (bool, optional): Whether to also save the per-row
+            detailed results next to the grouped results. Defaults to False.
+        exp_num (str, optional): Experiment name used in the output filename.
+            If None, uses the name of the current working directory.
+            Defaults to None.
+        date_str (str, optional): Date used in the output filename, as YYYYMMDD.
+            If None, uses today's date. Defaults to None.
     
     Returns:
         pd.DataFrame: DataFrame containing the classified frequencies and their 
@@ -43,24 +57,23 @@ def process_extracted_file(input_file: str, base: int = 50) -> pd.DataFrame:
         >>> print(df.head())
     """
     # Read Excel file
-    df = pd.read_excel(input_file)
+    df = load_xls_cached(Path(input_file))
     
-    # Identify frequency column (first column)
-    freq_column = df.columns[0]
-    mag_column = df.columns[1]
+    # Identify the frequency and magnitude columns
+    freq_column, mag_column = _detect_columns(df)
     
-    # Create result DataFrame with classified frequencies
-    result_df = pd.DataFrame({
-        'Original_Frequency': df[freq_column],
-        'Classified_Frequency': df[freq_column].apply(lambda x: classify_frequency(x, base)),
-        'Magnitude': df[mag_column]
-    })
+    # Classify all frequencies in a single vectorized pass
+    classified = classify_frequencies(df[freq_column], base).to_numpy()
+    mags = df[mag_column].to_numpy(dtype=np.float64)
+    bins = classified // base
     
     # Group by classified frequency and calculate mean magnitude
-    grouped_df = result_df.groupby('Classified_Frequency')['Magnitude'].agg([
-        ('Mean_Magnitude', 'mean'),
-        ('Count', 'count')
-    ]).reset_index()
+    unique_bins, mean_mags, counts = _groupby_mean_int(bins, mags)
+    grouped_df = pd.DataFrame({
+        'Classified_Frequency': unique_bins * base,
+        'Mean_Magnitude': mean_mags,
+        'Count': counts
+    })
     
     # Generate output filename with HL folder name
     path = Path(input_file)
@@ -68,8 +81,10 @@ def process_extracted_file(input_file: str, base: int = 50) -> pd.DataFrame:
     file_parts = path.stem.split('_')
     hl_folder = next((part for part in file_parts if part.startswith('HL')), '')
     file_name = path.stem
-    date_str = datetime.now().strftime('%Y%m%d')
-    exp_num = Path.cwd().name
+    if date_str is None:
+        date_str = datetime.now().strftime('%Y%m%d')
+    if exp_num is None:
+        exp_num = Path.cwd().name
     
     output_file = f"{exp_num}_{date_str}_{hl_folder}_{file_name}_reclass{base}.xlsx"
     output_path = Path("reclassified_frequencies") / output_file
@@ -77,18 +92,44 @@ def process_extracted_file(input_file: str, base: int = 50) -> pd.DataFrame:
     # Create output directory if it doesn't exist
     output_path.parent.mkdir(exist_ok=True)
     
-    # Save both detailed and grouped results
-    with pd.ExcelWriter(output_path) as writer:
-        result_df.to_excel(writer, sheet_name='Detailed_Results', index=False)
-        grouped_df.to_excel(writer, sheet_name='Grouped_Results', index=False)
+    # Save grouped results, and the detailed results if requested
+    sheets = {}
+    if write_detailed:
+        # Only build the per-row results when they are actually written
+        sheets['Detailed_Results'] = pd.DataFrame({
+            'Original_Frequency': df[freq_column].to_numpy(dtype=np.float64),
+            'Classified_Frequency': classified,
+            'Magnitude': mags
+        })
+    sheets['Grouped_Results'] = grouped_df
+    output_path = write_results(sheets, output_path, human=write_xlsx)
     
     print(f"Results saved to {output_path}")
     
     return grouped_df
 
-def process_all_files(input_dir: str = "extracted_frequencies", pattern: str = "*_magnitude.xlsx", base: int = 50) -> None:
+def _process_file_worker(file_path: str, base: int, write_xlsx: bool, write_detailed: bool, exp_num: str, date_str: str) -> None:
+    """Process a single extracted file in a worker process, reporting any error.
+    
+    Args:
+        file_path (str): Path to the extracted frequency file.
+        base (int): Base frequency for classification.
+        write_xlsx (bool): Whether to also save the results as an xlsx workbook.
+        write_detailed (bool): Whether to also save the detailed results.
+        exp_num (str): Experiment name used in the output filename.
+        date_str (str): Date used in the output filename.
+    """
+    try:
+        process_extracted_file(file_path, base, write_xlsx, write_detailed, exp_num, date_str)
+    except Exception as e:
+        print(f"Error processing {file_path}: {str(e)}")
+
+def process_all_files(input_dir: str = "extracted_frequencies", pattern: str = "*_magnitude.xlsx", base: int = 50, write_xlsx: bool = False, write_detailed: bool = False) -> None:
     """Process all extracted frequency files in the specified directory.
     
+    Each Excel file is read through its parquet sibling when one is up to
+    date, and parquet files without an Excel file are processed as well.
+    
     Args:
         input_dir (str, optional): Directory containing the files to process. 
             Defaults to "extracted_frequencies".
@@ -96,12 +137,22 @@ def process_all_files(input_dir: str = "extracted_frequencies", pattern: str = "
             Defaults to "*_magnitude.xlsx".
         base (int, optional): Base frequency for classification. 
             Defaults to 50.
+        write_xlsx (bool, optional): Whether to also save the results as
+            xlsx workbooks. Defaults to False.
+        write_detailed (bool, optional): Whether to also save the detailed
+            results. Defaults to False.
             
     Example:
         >>> process_all_files()
     """
-    # Get all matching files
+    # Get all matching files, plus the parquet output of the extractor that has no Excel file
+    suffix = Path(pattern).suffix
     files = glob.glob(os.path.join(input_dir, pattern))
+    files += [
+        f for f in glob.glob(os.path.join(input_dir, str(Path(pattern).with_suffix('.parquet'))))
+        if not Path(f).with_suffix(suffix).exists()
+    ]
+    files.sort()
     
     if not files:
         print(f"No files matching pattern '{pattern}' found in '{input_dir}'")
@@ -109,19 +160,23 @@ def process_all_files(input_dir: str = "extracted_frequencies", pattern: str = "
     
     print(f"Found {len(files)} files to process")
     
-    # Process each file
-    for file_path in tqdm(files, desc="Processing files"):
-        try:
-            process_extracted_file(file_path, base)
-        except Exception as e:
-            print(f"Error processing {file_path}: {str(e)}")
+    exp_num, date_str = run_stamp()
+    
+    run_parallel(_process_file_worker, files, base, write_xlsx, write_detailed, exp_num, date_str)
 
 def main():
     """Main function to process frequency classification for extracted files."""
+    parser = argparse.ArgumentParser(description="Reclassify extracted frequency files.")
+    parser.add_argument('--xlsx', action='store_true',
+                        help="also save the results as xlsx workbooks")
+    parser.add_argument('--detailed', action='store_true',
+                        help="also save the per-row detailed results")
+    args = parser.parse_args()
+    
     base_freq = 50  # Base frequency for classification
     
     print(f"Starting processing with {base_freq}Hz as base frequency")
-    process_all_files(base=base_freq)
+    process_all_files(base=base_freq, write_xlsx=args.xlsx, write_detailed=args.detailed)
     print("\nAll processing completed!")
 
 if __name__ == "__main__":
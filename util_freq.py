@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import pandas as pd
+
+# Lowercase substrings identifying the frequency and magnitude columns
+FREQ_TOKENS = {'frequency', 'freq', 'hz'}
+MAG_TOKENS = {'dbspl', 'mag', 'magnitude', 'db'}
+
+def _detect_columns(df: pd.DataFrame) -> tuple:
+    """Identify the frequency and magnitude columns of a DataFrame.
+    
+    Column names are lowercased once and matched against FREQ_TOKENS and
+    MAG_TOKENS. If no column matches, the first column is assumed to contain
+    frequencies and the second column magnitude values.
+    
+    Args:
+        df (pd.DataFrame): DataFrame read from an input file.
+    
+    Returns:
+        tuple: Names of the frequency column and the magnitude column.
+    
+    Example:
+        >>> _detect_columns(pd.DataFrame(columns=['Frequency (Hz)', 'dBSPL']))
+        ('Frequency (Hz)', 'dBSPL')
+    """
+    freq_column = None
+    mag_column = None
+    
+    for col in df.columns:
+        lc = str(col).lower()
+        if freq_column is None and any(tok in lc for tok in FREQ_TOKENS):
+            freq_column = col
+        if mag_column is None and any(tok in lc for tok in MAG_TOKENS):
+            mag_column = col
+    
+    if freq_column is None:
+        freq_column = df.columns[0]
+        print(f"Assuming first column '{freq_column}' contains frequencies")
+    
+    if mag_column is None:
+        mag_column = df.columns[1]
+        print(f"Assuming second column '{mag_column}' contains magnitude values")
+    
+    return freq_column, mag_column
+
+def classify_frequencies(freqs: pd.Series, base: int = 50) -> pd.Series:
+    """Classify a column of frequency values to the nearest base frequency multiple.
+    
+    Bulk counterpart of ``classify_frequency``, run as pandas ufuncs over the
+    whole column. ``round`` rounds half to even like the built-in ``round()``.
+    
+    Args:
+        freqs (pd.Series): Frequency values to classify.
+        base (int, optional): Base frequency for classification. 
+            Defaults to 50.
+    
+    Returns:
+        pd.Series: Classified frequency values as int64, with the index of ``freqs``.
+    
+    Example:
+        >>> classify_frequencies(pd.Series([123.45, 175.0]), 50).tolist()
+        [100, 200]
+    """
+    return freqs.div(base).round().mul(base).astype('int64')
+
+def _bincount_mean(bins: np.ndarray, mags: np.ndarray) -> tuple:
+    """Calculate the mean magnitude and count for each integer frequency bin.
+    
+    Uses ``np.bincount`` for the reduction, which avoids the hashing done by
+    a pandas groupby. Like ``groupby(...).agg(['mean', 'count'])``, NaN
+    magnitudes are left out of both the mean and the count.
+    
+    Args:
+        bins (np.ndarray): Integer bin number of each row.
+        mags (np.ndarray): Magnitude value of each row.
+    
+    Returns:
+        tuple: Sorted unique bin numbers, mean magnitude per bin and number
+            of magnitude values per bin.
+    
+    Example:
+        >>> _bincount_mean(np.array([2, 3, 2]), np.array([1.0, 5.0, 3.0]))
+        (array([2, 3]), array([2., 5.]), array([2, 1]))
+    """
+    # Shift bins to start at zero, as bincount only accepts non-negative values
+    offset = bins.min() if len(bins) else 0
+    shifted = bins - offset
+    
+    valid = ~np.isnan(mags)
+    rows = np.bincount(shifted)
+    counts = np.bincount(shifted, weights=valid).astype(np.int64)
+    sums = np.bincount(shifted, weights=np.where(valid, mags, 0.0))
+    
+    unique = np.nonzero(rows)[0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums[unique] / counts[unique]
+    
+    return unique + offset, means, counts[unique]
+
+def _reduceat_mean(bins: np.ndarray, mags: np.ndarray) -> tuple:
+    """Calculate the mean magnitude and count per bin by sorting and reducing runs.
+    
+    Unlike ``_bincount_mean``, memory use does not depend on the range of the
+    bin numbers, so sparse or very wide bins stay cheap. NaN magnitudes are
+    left out of both the mean and the count.
+    
+    Args:
+        bins (np.ndarray): Integer bin number of each row.
+        mags (np.ndarray): Magnitude value of each row.
+    
+    Returns:
+        tuple: Sorted unique bin numbers, mean magnitude per bin and number
+            of magnitude values per bin.
+    """
+    if len(bins) == 0:
+        return bins.copy(), np.empty(0, dtype=np.float64), np.empty(0, dtype=np.int64)
+    
+    order = np.argsort(bins, kind='stable')
+    b_sorted = bins[order]
+    m_sorted = mags[order]
+    
+    # Start position of each run of equal bin numbers
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(b_sorted)) + 1))
+    
+    valid = ~np.isnan(m_sorted)
+    sums = np.add.reduceat(np.where(valid, m_sorted, 0.0), starts)
+    counts = np.add.reduceat(valid.astype(np.int64), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    
+    return b_sorted[starts], means, counts
+
+def _groupby_mean_int(bins: np.ndarray, mags: np.ndarray) -> tuple:
+    """Calculate the mean magnitude and count for each integer frequency bin.
+    
+    Uses ``_bincount_mean`` when the bins are dense enough for a bincount
+    array to stay small, and ``_reduceat_mean`` otherwise.
+    
+    Args:
+        bins (np.ndarray): Integer bin number of each row.
+        mags (np.ndarray): Magnitude value of each row.
+    
+    Returns:
+        tuple: Sorted unique bin numbers, mean magnitude per bin and number
+            of magnitude values per bin.
+    """
+    span = int(bins.max() - bins.min()) + 1 if len(bins) else 0
+    if span <= 2 * len(bins):
+        return _bincount_mean(bins, mags)
+    
+    return _reduceat_mean(bins, mags)
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from itertools import chain, repeat
+from tqdm import tqdm
+
+def _iter_xls(*folders: str):
+    """Yield the paths of the .xls files in one or more folders as they are found.
+    
+    Like ``glob``, paths that are not directories and hidden files, such as
+    macOS ``._`` resource files, are skipped.
+    
+    Args:
+        *folders (str): Paths of the folders to scan, in order.
+    
+    Returns:
+        generator: Paths of the .xls files in the folders.
+    """
+    return chain.from_iterable(
+        (entry.path for entry in os.scandir(folder)
+         if entry.is_file() and entry.name.endswith('.xls') and not entry.name.startswith('.'))
+        for folder in folders if os.path.isdir(folder)
+    )
+
+def run_stamp() -> tuple:
+    """Get the experiment name and date used in the output filenames of a run.
+    
+    Called once by the parent process and passed to every worker, so all
+    files of a run share one date and workers never depend on their own cwd.
+    
+    Returns:
+        tuple: Name of the current working directory, and today's date as YYYYMMDD.
+    """
+    return Path.cwd().name, datetime.now().strftime('%Y%m%d')
+
+def _run_captured(worker, file_path: str, *args) -> str:
+    """Call a worker for one file, capturing what it prints.
+    
+    Args:
+        worker (callable): Function called as ``worker(file_path, *args)``.
+        file_path (str): Path of the file to process.
+        *args: Further arguments passed to the worker.
+    
+    Returns:
+        str: Everything the worker printed to stdout.
+    """
+    with redirect_stdout(io.StringIO()) as out:
+        worker(file_path, *args)
+    return out.getvalue()
+
+def run_parallel(worker, files, *args) -> None:
+    """Call a worker for every file in a process pool, showing progress.
+    
+    The files are independent, so they are spread over one worker process
+    per CPU. Results are written to disk by the worker, so nothing is returned.
+    What a worker prints is collected and printed above the progress bar by
+    the parent process, so it does not break up the bar.
+    
+    Args:
+        worker (callable): Module-level function called as
+            ``worker(file_path, *args)``.
+        files (iterable): Paths of the files to process.
+        *args: Further arguments passed unchanged to every call.
+    
+    Example:
+        >>> run_parallel(_process_file_worker, _iter_xls("HL1", "HL2"), 50)
+    """
+    total = len(files) if hasattr(files, '__len__') else None
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        results = executor.map(_run_captured, repeat(worker), files, *(repeat(arg) for arg in args))
+        for output in tqdm(results, total=total, desc="Processing files"):
+            if output:
+                tqdm.write(output.rstrip('\n'))
+
+def _excel_read_kwargs(path: Path) -> dict:
+    """Select the fastest available Excel reader for a file based on its suffix.
+    
+    Legacy ``.xls`` files are parsed with calamine, which is much faster than
+    xlrd. Newer formats are opened with openpyxl in read-only mode, which
+    streams the sheet instead of building the full random-access workbook.
+    
+    Args:
+        path (Path): Path to the Excel file.
+    
+    Returns:
+        dict: Keyword arguments for ``pd.read_excel``.
+    """
+    if path.suffix.lower() == '.xls':
+        return {'engine': 'calamine'}
+    
+    return {'engine': 'openpyxl', 'engine_kwargs': {'read_only': True, 'data_only': True}}
+
+def _source_stamp(path: Path) -> dict:
+    """Get the modification time and size of a source file, as parquet metadata.
+    
+    Args:
+        path (Path): Path to the source file.
+    
+    Returns:
+        dict: Metadata entries identifying the current version of the file.
+    """
+    stat = path.stat()
+    return {b'source_mtime_ns': str(stat.st_mtime_ns).encode(), b'source_size': str(stat.st_size).encode()}
+
+def _cache_is_current(cache_path: Path, path: Path) -> bool:
+    """Check whether a parquet sidecar was written from the current version of its source.
+    
+    The cache stores the modification time and size of the source it was
+    built from, so a source that is replaced by an older copy, for example
+    with ``cp -p`` or from an archive, is still parsed again. A cache that
+    cannot be read, such as one left truncated by an interrupted run, counts
+    as out of date.
+    
+    Args:
+        cache_path (Path): Path to the parquet sidecar.
+        path (Path): Path to the Excel source.
+    
+    Returns:
+        bool: True if the cache can be used instead of the source.
+    """
+    if not cache_path.exists():
+        return False
+    
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+    except (OSError, pa.ArrowException) as e:
+        print(f"Ignoring unreadable cache {cache_path}: {str(e)}")
+        return False
+    
+    stamp = _source_stamp(path)
+    return all(metadata.get(key) == value for key, value in stamp.items())
+
+def load_xls_cached(path: Path) -> pd.DataFrame:
+    """Read an Excel file, using a parquet sidecar cache when it is up to date.
+    
+    The first read parses the Excel file and writes ``path.with_suffix('.parquet')``
+    next to it. Later reads load the parquet file instead, as long as it was
+    built from the current version of the Excel source. A parquet path is
+    read directly. If the cache cannot be written, for example in a read-only
+    folder, or cannot be read, the data is still returned from the Excel file.
+    Column names are always strings, as stored in the cache.
+    
+    Columns are returned with pyarrow-backed dtypes, so bulk arithmetic and
+    indexing run on Arrow's columnar kernels.
+    
+    Args:
+        path (Path): Path to the input Excel file.
+    
+    Returns:
+        pd.DataFrame: Contents of the first sheet of the Excel file.
+    
+    Example:
+        >>> df = load_xls_cached(Path("HL1/Pon.xls"))
+        >>> print(df.head())
+    """
+    path = Path(path)
+    if path.suffix.lower() == '.parquet':
+        return pq.read_table(path).to_pandas(types_mapper=pd.ArrowDtype)
+    
+    cache_path = path.with_suffix('.parquet')
+    if _cache_is_current(cache_path, path):
+        try:
+            return pq.read_table(cache_path).to_pandas(types_mapper=pd.ArrowDtype)
+        except (OSError, pa.ArrowException) as e:
+            print(f"Ignoring unreadable cache {cache_path}: {str(e)}")
+    
+    df = pd.read_excel(path, dtype_backend='pyarrow', **_excel_read_kwargs(path))
+    df = df.rename(columns=str)
+    try:
+        write_parquet(df, cache_path, source=path)
+    except OSError as e:
+        print(f"Could not write cache {cache_path}: {str(e)}")
+    
+    return df
+
+def write_parquet(df: pd.DataFrame, path: Path, source: Path = None) -> None:
+    """Write a DataFrame to a parquet file.
+    
+    Column names are stored as strings, since parquet does not accept the
+    numeric headers that Excel sheets sometimes produce. The file is written
+    under a temporary name and then moved into place, so an interrupted write
+    never leaves a truncated file at ``path``.
+    
+    Args:
+        df (pd.DataFrame): DataFrame to write.
+        path (Path): Path of the output parquet file.
+        source (Path, optional): Excel file the parquet file is a cache of.
+            Its modification time and size are stored in the file metadata
+            for ``load_xls_cached``. Defaults to None.
+    """
+    path = Path(path)
+    table = pa.Table.from_pandas(df.rename(columns=str), preserve_index=False)
+    if source is not None:
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), **_source_stamp(Path(source))})
+    
+    # Hidden, per-process name, so glob patterns and other workers never see it
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Also clean up on Ctrl-C, so no temporary files are left behind
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+def write_results(df, path: Path, human: bool = False) -> Path:
+    """Write processing results for the next pipeline step, and optionally as xlsx.
+    
+    Parquet output is always written, since it is what the next script in the
+    pipeline reads. An xlsx workbook is only written when a human-facing file
+    is requested.
+    
+    Args:
+        df (pd.DataFrame or dict): DataFrame to write, or a mapping of sheet
+            names to DataFrames. Each sheet is written to its own parquet file
+            named after the sheet.
+        path (Path): Path of the output file. The suffix is replaced as needed.
+        human (bool, optional): Whether to also write an xlsx workbook.
+            Defaults to False.
+    
+    Returns:
+        Path: Path of the xlsx workbook if requested, otherwise of the parquet file.
+    
+    Example:
+        >>> write_results({'Grouped_Results': grouped_df}, Path("out.xlsx"), human=True)
+    """
+    path = Path(path)
+    sheets = df if isinstance(df, dict) else None
+    
+    if human:
+        xlsx_path = path.with_suffix('.xlsx')
+        if sheets is None:
+            df.to_excel(xlsx_path, index=False)
+        else:
+            with pd.ExcelWriter(xlsx_path) as writer:
+                for sheet_name, sheet_df in sheets.items():
+                    sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
+    
+    # Written after the xlsx file and stamped with it, so it is valid as its load_xls_cached sidecar
+    if sheets is None:
+        parquet_path = path.with_suffix('.parquet')
+        write_parquet(df, parquet_path, source=xlsx_path if human else None)
+    else:
+        for sheet_name, sheet_df in sheets.items():
+            parquet_path = path.with_name(f"{path.stem}_{sheet_name}.parquet")
+            write_parquet(sheet_df, parquet_path)
+    
+    return xlsx_path if human else parquet_path